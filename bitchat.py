@@ -5,220 +5,288 @@ Two clients can discover and connect to each other for local messaging.
 """
 
 import asyncio
+import fcntl
+import functools
+import os
+import stat
 import sys
 import uuid
 import signal
-from typing import Optional, List
+import socket
+import struct
+from typing import Dict, Optional, List, Tuple
 from bleak import BleakScanner, BleakClient, BleakGATTCharacteristic
 from bleak.backends.device import BLEDevice
-import dbus
-import dbus.exceptions
-import dbus.service
-import dbus.mainloop.glib
-from gi.repository import GLib
+from dbus_fast import BusType, Message, MessageType
+from dbus_fast.aio import MessageBus
+from dbus_fast.errors import DBusError
+from dbus_fast.service import PropertyAccess, ServiceInterface, dbus_property, method
 
 # GATT Service and Characteristic UUIDs
 CHAT_SERVICE_UUID = "00001234-0000-1000-8000-00805f9b34fb"
 TX_CHAR_UUID = "00001235-0000-1000-8000-00805f9b34fb"  # Write/Notify
 RX_CHAR_UUID = "00001236-0000-1000-8000-00805f9b34fb"  # Read/Notify
 
+# Default 23-byte ATT MTU minus the 3-byte ATT header
+DEFAULT_ATT_PAYLOAD = 20
+# Largest ATT MTU (BLE 5), used to size reads from the notification socket
+MAX_ATT_MTU = 517
+# ATT caps any attribute value at 512 bytes, so an MTU of MAX_ATT_MTU must
+# not produce 514-byte writes
+MAX_ATTR_VALUE_LEN = 512
+
+# Maximum number of write-without-response PDUs in flight at once
+TX_QUEUE_DEPTH = 16
+# Seconds to wait for queued writes to finish before disconnecting
+TX_DRAIN_TIMEOUT = 5.0
+# Seconds to collect outgoing messages before flushing them together,
+# well under one connection interval
+TX_COALESCE_DELAY = 0.005
+
+# Raw HCI access for link-layer tuning BlueZ does not expose over D-Bus
+HCI_DEV_ID = 0  # hci0, Bleak's default adapter
+HCI_COMMAND_PKT = 0x01
+HCI_EVENT_PKT = 0x04
+HCI_EV_CMD_COMPLETE = 0x0E
+HCI_EV_CMD_STATUS = 0x0F
+SOL_HCI = 0
+HCI_FILTER = 2
+HCI_LE_LINK = 0x80
+HCIGETCONNINFO = 0x800448D5  # _IOR('H', 213, int)
+HCI_OP_LE_CONN_UPDATE = 0x2013
+HCI_OP_LE_SET_PHY = 0x2032
+HCI_CMD_TIMEOUT = 0.5
+LE_PHY_2M = 0x02
+
+# Connection parameter profiles: (min interval, max interval, peripheral
+# latency, supervision timeout) in 1.25 ms / events / 10 ms units
+CONN_PARAM_PROFILES = {
+    "fast": (0x0006, 0x000C, 0, 0x01F4),  # 7.5-15 ms
+    "balanced": (0x0018, 0x0028, 0, 0x01F4),  # 30-50 ms
+    "power": (0x0050, 0x00A0, 4, 0x0258),  # 100-200 ms
+}
+DEFAULT_CONN_PARAMS = "balanced"
+
+# Seconds to wait for advertising/GATT registration before showing the prompt
+PERIPHERAL_SETUP_TIMEOUT = 2.0
+
 # BlueZ D-Bus paths
 BLUEZ_SERVICE = "org.bluez"
 ADAPTER_IFACE = "org.bluez.Adapter1"
 DEVICE_IFACE = "org.bluez.Device1"
+DBUS_PROPERTIES_IFACE = "org.freedesktop.DBus.Properties"
 LE_ADVERTISING_MANAGER_IFACE = "org.bluez.LEAdvertisingManager1"
+DBUS_OM_IFACE = "org.freedesktop.DBus.ObjectManager"
 LE_ADVERTISEMENT_IFACE = "org.bluez.LEAdvertisement1"
 GATT_MANAGER_IFACE = "org.bluez.GattManager1"
 GATT_SERVICE_IFACE = "org.bluez.GattService1"
 GATT_CHAR_IFACE = "org.bluez.GattCharacteristic1"
 
+# Root of our GATT application; BlueZ calls GetManagedObjects here
+APP_PATH = "/org/bluez/example"
+
+# Every message is framed with a little-endian uint32 length prefix so that
+# MTU-sized fragments can be reassembled before decoding
+FRAME_HEADER = struct.Struct("<I")
+# Frames claiming more than this are treated as corrupt
+MAX_MESSAGE_LEN = 64 * 1024
+
+STDIN_FD = 0
+
+# Message queue sentinel used to wake process_messages on shutdown
+QUIT_MESSAGE = ("__quit__", None)
+
+
+class MessageReassembler:
+    """Reassemble length-prefixed messages from a stream of BLE fragments"""
+
+    def __init__(self):
+        self._rx_buf = bytearray()
+
+    def feed(self, data) -> List[str]:
+        """Append a fragment and return any messages it completed"""
+        self._rx_buf.extend(data)
+        messages = []
+        while len(self._rx_buf) >= FRAME_HEADER.size:
+            (length,) = FRAME_HEADER.unpack_from(self._rx_buf)
+            if length > MAX_MESSAGE_LEN:
+                # Not a frame header (e.g. an unframed write); drop what we
+                # have so the next frame starts from a clean buffer
+                print(f"[Error: bad frame length {length}, discarding buffer]")
+                self._rx_buf.clear()
+                break
+            end = FRAME_HEADER.size + length
+            if len(self._rx_buf) < end:
+                break
+            with memoryview(self._rx_buf) as view:
+                frame = bytes(view[FRAME_HEADER.size:end])
+            del self._rx_buf[:end]
+            try:
+                messages.append(frame.decode("utf-8"))
+            except UnicodeDecodeError as e:
+                print(f"[Error decoding message: {e}]")
+        return messages
+
+    def reset(self):
+        self._rx_buf.clear()
 
-class ChatAdvertisement(dbus.service.Object):
+
+class ChatAdvertisement(ServiceInterface):
     """D-Bus advertisement object for making device discoverable"""
 
     PATH_BASE = "/org/bluez/example/advertisement"
 
-    def __init__(self, bus, index, name):
+    def __init__(self, index, name):
+        super().__init__(LE_ADVERTISEMENT_IFACE)
         self.path = self.PATH_BASE + str(index)
-        self.bus = bus
         self.ad_type = "peripheral"
         self.service_uuids = [CHAT_SERVICE_UUID]
         self.local_name = name
         self.include_tx_power = True
-        dbus.service.Object.__init__(self, bus, self.path)
-
-    def get_properties(self):
-        return {
-            LE_ADVERTISEMENT_IFACE: {
-                "Type": self.ad_type,
-                "ServiceUUIDs": dbus.Array(self.service_uuids, signature="s"),
-                "LocalName": dbus.String(self.local_name),
-                "IncludeTxPower": dbus.Boolean(self.include_tx_power),
-            }
-        }
-
-    def get_path(self):
-        return dbus.ObjectPath(self.path)
-
-    @dbus.service.method(LE_ADVERTISEMENT_IFACE, in_signature="", out_signature="")
+
+    @method()
     def Release(self):
         print("[Advertisement] Released")
 
-    @dbus.service.method(dbus.PROPERTIES_IFACE, in_signature="s", out_signature="a{sv}")
-    def GetAll(self, interface):
-        if interface == LE_ADVERTISEMENT_IFACE:
-            return self.get_properties()[LE_ADVERTISEMENT_IFACE]
-        else:
-            raise dbus.exceptions.DBusException(
-                "org.freedesktop.DBus.UnknownInterface",
-                "Interface {} is not supported".format(interface),
-            )
+    @dbus_property(access=PropertyAccess.READ)
+    def Type(self) -> "s":
+        return self.ad_type
 
-    @dbus.service.method(dbus.PROPERTIES_IFACE, in_signature="ss", out_signature="v")
-    def Get(self, interface, prop):
-        return self.get_properties()[interface][prop]
+    @dbus_property(access=PropertyAccess.READ)
+    def ServiceUUIDs(self) -> "as":
+        return self.service_uuids
 
-    @dbus.service.method(dbus.PROPERTIES_IFACE, in_signature="ssv", out_signature="")
-    def Set(self, interface, prop, value):
-        pass
+    @dbus_property(access=PropertyAccess.READ)
+    def LocalName(self) -> "s":
+        return self.local_name
 
-    @dbus.service.signal(dbus.PROPERTIES_IFACE, signature="sa{sv}as")
-    def PropertiesChanged(self, interface, changed, invalidated):
-        pass
+    @dbus_property(access=PropertyAccess.READ)
+    def IncludeTxPower(self) -> "b":
+        return self.include_tx_power
 
 
-class ChatService(dbus.service.Object):
+class ChatService(ServiceInterface):
     """GATT Service for chat communication"""
 
-    PATH_BASE = "/org/bluez/example/service"
+    PATH_BASE = APP_PATH + "/service"
 
-    def __init__(self, bus, index, uuid, primary):
+    def __init__(self, index, uuid, primary):
+        super().__init__(GATT_SERVICE_IFACE)
         self.path = self.PATH_BASE + str(index)
-        self.bus = bus
         self.uuid = uuid
         self.primary = primary
         self.characteristics = []
-        dbus.service.Object.__init__(self, bus, self.path)
-
-    def get_properties(self):
-        return {
-            GATT_SERVICE_IFACE: {
-                "UUID": self.uuid,
-                "Primary": self.primary,
-                "Characteristics": dbus.Array(
-                    self.get_characteristic_paths(), signature="o"
-                ),
-            }
-        }
-
-    def get_path(self):
-        return dbus.ObjectPath(self.path)
+        self._characteristic_paths = []
 
     def add_characteristic(self, characteristic):
         self.characteristics.append(characteristic)
+        self._characteristic_paths = self.get_characteristic_paths()
 
     def get_characteristic_paths(self):
         result = []
         for chrc in self.characteristics:
-            result.append(chrc.get_path())
+            result.append(chrc.path)
         return result
 
-    @dbus.service.method(dbus.PROPERTIES_IFACE, in_signature="s", out_signature="a{sv}")
-    def GetAll(self, interface):
-        if interface == GATT_SERVICE_IFACE:
-            return self.get_properties()[GATT_SERVICE_IFACE]
-        else:
-            raise dbus.exceptions.DBusException(
-                "org.freedesktop.DBus.UnknownInterface",
-                "Interface {} is not supported".format(interface),
-            )
+    @dbus_property(access=PropertyAccess.READ)
+    def UUID(self) -> "s":
+        return self.uuid
 
-    @dbus.service.method(dbus.PROPERTIES_IFACE, in_signature="ss", out_signature="v")
-    def Get(self, interface, prop):
-        return self.get_properties()[interface][prop]
+    @dbus_property(access=PropertyAccess.READ)
+    def Primary(self) -> "b":
+        return self.primary
 
+    @dbus_property(access=PropertyAccess.READ)
+    def Characteristics(self) -> "ao":
+        return self._characteristic_paths
 
-class ChatCharacteristic(dbus.service.Object):
-    """GATT Characteristic for message transmission/reception"""
 
-    PATH_BASE = "/org/bluez/example/char"
+class ChatCharacteristic(ServiceInterface):
+    """GATT Characteristic for message transmission/reception"""
 
-    def __init__(self, bus, index, uuid, flags, service, message_handler):
-        self.path = self.PATH_BASE + str(index)
-        self.bus = bus
+    def __init__(self, index, uuid, flags, service, message_handler):
+        super().__init__(GATT_CHAR_IFACE)
+        # Characteristics live under their service so BlueZ finds them
+        # through the application's ObjectManager
+        self.path = f"{service.path}/char{index}"
         self.uuid = uuid
         self.service = service
         self.flags = flags
         self.message_handler = message_handler
-        self.value = []
-        dbus.service.Object.__init__(self, bus, self.path)
-
-    def get_properties(self):
-        return {
-            GATT_CHAR_IFACE: {
-                "Service": self.service.get_path(),
-                "UUID": self.uuid,
-                "Flags": self.flags,
-                "Value": dbus.Array(self.value, signature="y"),
-            }
-        }
-
-    def get_path(self):
-        return dbus.ObjectPath(self.path)
-
-    @dbus.service.method(dbus.PROPERTIES_IFACE, in_signature="s", out_signature="a{sv}")
-    def GetAll(self, interface):
-        if interface == GATT_CHAR_IFACE:
-            return self.get_properties()[GATT_CHAR_IFACE]
-        else:
-            raise dbus.exceptions.DBusException(
-                "org.freedesktop.DBus.UnknownInterface",
-                "Interface {} is not supported".format(interface),
-            )
+        # Kept as bytes so "ay" is marshalled in one piece, not per element
+        self.value = b""
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Service(self) -> "o":
+        return self.service.path
+
+    @dbus_property(access=PropertyAccess.READ)
+    def UUID(self) -> "s":
+        return self.uuid
 
-    @dbus.service.method(dbus.PROPERTIES_IFACE, in_signature="ss", out_signature="v")
-    def Get(self, interface, prop):
-        return self.get_properties()[interface][prop]
+    @dbus_property(access=PropertyAccess.READ)
+    def Flags(self) -> "as":
+        return self.flags
 
-    @dbus.service.method(GATT_CHAR_IFACE, in_signature="a{sv}", out_signature="ay")
-    def ReadValue(self, options):
+    @dbus_property(access=PropertyAccess.READ)
+    def Value(self) -> "ay":
         return self.value
 
-    @dbus.service.method(GATT_CHAR_IFACE, in_signature="aya{sv}")
-    def WriteValue(self, value, options):
-        if self.message_handler:
-            try:
-                message = bytes(value).decode("utf-8")
-                self.message_handler(message)
-            except Exception as e:
-                print(f"[Error decoding message: {e}]")
+    @method()
+    def ReadValue(self, options: "a{sv}") -> "ay":
+        return self.value
+
+    @method()
+    def WriteValue(self, value: "ay", options: "a{sv}"):
         self.value = value
+        if self.message_handler is None:
+            return
+        # Raw fragments go to the handler; decoding waits for reassembly
+        device = options.get("device")
+        try:
+            self.message_handler(value, device.value if device else None)
+        except Exception as e:
+            print(f"[Error handling message: {e}]")
 
-    @dbus.service.method(GATT_CHAR_IFACE)
+    @method()
     def StartNotify(self):
         pass
 
-    @dbus.service.method(GATT_CHAR_IFACE)
+    @method()
     def StopNotify(self):
         pass
 
-    @dbus.service.signal(dbus.PROPERTIES_IFACE, signature="sa{sv}as")
-    def PropertiesChanged(self, interface, changed, invalidated):
-        pass
-
 
 class BLEChatPeer:
     """Main BLE Chat peer that can act as both peripheral and central"""
 
     def __init__(self, username: str):
         self.username = username
+        self._user_prefix = f"{username}: ".encode("utf-8")
         self.client: Optional[BleakClient] = None
         self.connected_address: Optional[str] = None
         self.running = True
         self.tx_char: Optional[BleakGATTCharacteristic] = None
         self.rx_char: Optional[BleakGATTCharacteristic] = None
+        self._chunk = DEFAULT_ATT_PAYLOAD
+        self._tx_queue: asyncio.Queue = asyncio.Queue()
+        self._tx_sem = asyncio.Semaphore(TX_QUEUE_DEPTH)
+        self._tx_task: Optional[asyncio.Task] = None
+        self._pending_tx = bytearray()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # SEQPACKET sockets from AcquireWrite/AcquireNotify, bypassing D-Bus
+        self._tx_sock: Optional[socket.socket] = None
+        self._rx_sock: Optional[socket.socket] = None
+        # Stays set after the RX socket closes, so disconnect() knows Bleak
+        # never started a notify session
+        self._notify_acquired = False
+        # Peripheral writes (one stream per central, keyed by device path)
+        # and central notifications are separate streams
+        self._write_reassemblers: Dict[Optional[str], MessageReassembler] = {}
+        self._notify_reassembler = MessageReassembler()
         self.message_queue = asyncio.Queue()
-        self.bus = None
+        self._stdin_reader: Optional[asyncio.StreamReader] = None
+        self.bus: Optional[MessageBus] = None
         self.adapter = None
         self.ad_manager = None
         self.gatt_manager = None
@@ -226,57 +294,82 @@ class BLEChatPeer:
         self.service = None
         self.tx_characteristic = None
         self.rx_characteristic = None
+        self._managed_objects = {}
 
-    def setup_peripheral(self):
+    async def setup_peripheral(self):
         """Set up peripheral mode (advertising) using BlueZ D-Bus"""
         try:
-            dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
-            self.bus = dbus.SystemBus()
+            self.bus = await MessageBus(bus_type=BusType.SYSTEM, negotiate_unix_fd=True).connect()
+
+            # Sync the object tree once, then track changes via signals
+            # instead of calling GetManagedObjects again
+            root = self.bus.get_proxy_object(
+                BLUEZ_SERVICE, "/", await self.bus.introspect(BLUEZ_SERVICE, "/")
+            )
+            om = root.get_interface(DBUS_OM_IFACE)
+            self._managed_objects = await om.call_get_managed_objects()
+            om.on_interfaces_added(self._on_interfaces_added)
+            om.on_interfaces_removed(self._on_interfaces_removed)
 
             # Find the first available adapter
-            adapter_path = None
-            om = dbus.Interface(self.bus.get_object(BLUEZ_SERVICE, "/"), "org.freedesktop.DBus.ObjectManager")
-            objects = om.GetManagedObjects()
-            for path, interfaces in objects.items():
-                if LE_ADVERTISING_MANAGER_IFACE in interfaces:
-                    adapter_path = path
-                    break
+            adapter_path = self._find_adapter_path()
 
             if not adapter_path:
                 print("[Warning] No BLE adapter found. Peripheral mode disabled.")
                 return False
 
-            self.adapter = self.bus.get_object(BLUEZ_SERVICE, adapter_path)
-            self.ad_manager = dbus.Interface(self.adapter, LE_ADVERTISING_MANAGER_IFACE)
-            self.gatt_manager = dbus.Interface(self.adapter, GATT_MANAGER_IFACE)
+            self.adapter = self.bus.get_proxy_object(
+                BLUEZ_SERVICE, adapter_path, await self.bus.introspect(BLUEZ_SERVICE, adapter_path)
+            )
+            self.ad_manager = self.adapter.get_interface(LE_ADVERTISING_MANAGER_IFACE)
+            self.gatt_manager = self.adapter.get_interface(GATT_MANAGER_IFACE)
 
             # Create and register advertisement
-            self.advertisement = ChatAdvertisement(self.bus, 0, f"BitChat-{self.username}")
-            self.ad_manager.RegisterAdvertisement(
-                self.advertisement.get_path(),
-                {},
-                reply_handler=self._register_ad_cb,
-                error_handler=self._register_ad_error_cb,
-            )
+            self.advertisement = ChatAdvertisement(0, f"BitChat-{self.username}")
+            self.bus.export(self.advertisement.path, self.advertisement)
+            try:
+                await self.ad_manager.call_register_advertisement(self.advertisement.path, {})
+                self._register_ad_cb()
+            except DBusError as e:
+                self._register_ad_error_cb(e)
 
             # Create and register GATT service
-            self.service = ChatService(self.bus, 0, CHAT_SERVICE_UUID, True)
+            self.service = ChatService(0, CHAT_SERVICE_UUID, True)
             self.tx_characteristic = ChatCharacteristic(
-                self.bus, 0, TX_CHAR_UUID, ["write", "notify"], self.service, self._handle_received_message
+                0, TX_CHAR_UUID, ["write", "write-without-response", "notify"], self.service, self._handle_received_message
             )
             self.rx_characteristic = ChatCharacteristic(
-                self.bus, 1, RX_CHAR_UUID, ["read", "notify"], self.service, None
+                1, RX_CHAR_UUID, ["read", "notify"], self.service, None
             )
             self.service.add_characteristic(self.tx_characteristic)
             self.service.add_characteristic(self.rx_characteristic)
-
-            self.gatt_manager.RegisterApplication(
-                self.service.get_path(),
-                {},
-                reply_handler=self._register_app_cb,
-                error_handler=self._register_app_error_cb,
+            self.bus.export(self.service.path, self.service)
+            self.bus.export(self.tx_characteristic.path, self.tx_characteristic)
+            self.bus.export(self.rx_characteristic.path, self.rx_characteristic)
+
+            # Watch centrals (dis)connecting so each link starts a fresh stream
+            self.bus.add_message_handler(self._on_bluez_signal)
+            await self.bus.call(
+                Message(
+                    destination="org.freedesktop.DBus",
+                    path="/org/freedesktop/DBus",
+                    interface="org.freedesktop.DBus",
+                    member="AddMatch",
+                    signature="s",
+                    body=[
+                        f"type='signal',sender='{BLUEZ_SERVICE}',"
+                        f"interface='{DBUS_PROPERTIES_IFACE}',member='PropertiesChanged',"
+                        f"arg0='{DEVICE_IFACE}'"
+                    ],
+                )
             )
 
+            try:
+                await self.gatt_manager.call_register_application(APP_PATH, {})
+                self._register_app_cb()
+            except DBusError as e:
+                self._register_app_error_cb(e)
+
             print(f"[Peripheral] Advertising as 'BitChat-{self.username}'")
             return True
 
@@ -285,6 +378,41 @@ class BLEChatPeer:
             print("[Info] You can still connect to other devices, but others won't be able to discover you.")
             return False
 
+    def _find_adapter_path(self) -> Optional[str]:
+        """Return the first cached adapter path that supports advertising"""
+        return next(
+            (path for path, interfaces in self._managed_objects.items()
+             if LE_ADVERTISING_MANAGER_IFACE in interfaces),
+            None,
+        )
+
+    def _on_interfaces_added(self, path, interfaces):
+        """Merge newly added D-Bus interfaces into the managed object cache"""
+        self._managed_objects.setdefault(path, {}).update(interfaces)
+
+    def _on_bluez_signal(self, msg: Message):
+        """Reset a central's reassembly buffer when its connection state changes"""
+        if (
+            msg.message_type == MessageType.SIGNAL
+            and msg.interface == DBUS_PROPERTIES_IFACE
+            and msg.member == "PropertiesChanged"
+            and msg.body[0] == DEVICE_IFACE
+            and "Connected" in msg.body[1]
+        ):
+            self._write_reassemblers.pop(msg.path, None)
+
+    def _on_interfaces_removed(self, path, interfaces):
+        """Drop removed D-Bus interfaces from the managed object cache"""
+        if DEVICE_IFACE in interfaces:
+            self._write_reassemblers.pop(path, None)
+        cached = self._managed_objects.get(path)
+        if cached is None:
+            return
+        for iface in interfaces:
+            cached.pop(iface, None)
+        if not cached:
+            del self._managed_objects[path]
+
     def _register_ad_cb(self):
         print("[Peripheral] Advertisement registered")
 
@@ -297,21 +425,23 @@ class BLEChatPeer:
     def _register_app_error_cb(self, error):
         print(f"[Peripheral] Failed to register GATT application: {error}")
 
-    def _handle_received_message(self, message: str):
-        """Handle incoming message from peripheral mode"""
-        asyncio.create_task(self.message_queue.put(("received", message)))
+    def _handle_received_message(self, data: bytes, device: Optional[str]):
+        """Handle incoming message fragment from peripheral mode"""
+        reassembler = self._write_reassemblers.get(device)
+        if reassembler is None:
+            reassembler = self._write_reassemblers[device] = MessageReassembler()
+        for message in reassembler.feed(data):
+            self.message_queue.put_nowait(("received", message))
 
     async def scan_for_peers(self, timeout: float = 5.0) -> List[BLEDevice]:
         """Scan for nearby BLE devices advertising the chat service"""
         print(f"\n[*] Scanning for BLE chat peers (timeout: {timeout}s)...")
-        devices = await BleakScanner.discover(timeout=timeout)
-        
-        # Filter devices that are chat peers (name must start with "BitChat")
-        chat_peers = []
-        for device in devices:
-            if device.name and device.name.startswith("BitChat"):
-                chat_peers.append(device)
-        
+        # Filter on the chat service UUID so BlueZ drops unrelated
+        # advertisements before they reach us
+        async with BleakScanner(service_uuids=[CHAT_SERVICE_UUID]) as scanner:
+            await asyncio.sleep(timeout)
+            chat_peers = list(scanner.discovered_devices)
+
         if not chat_peers:
             print("[*] No BitChat peers found. Make sure another device is running the app.")
             return []
@@ -325,6 +455,11 @@ class BLEChatPeer:
             print("[!] Already connected. Disconnect first.")
             return False
 
+        # A link the peer dropped leaves the previous worker and sockets behind
+        self._stop_send_worker()
+        self._close_char_sockets()
+        self._notify_reassembler.reset()
+
         try:
             print(f"[*] Connecting to {address}...")
             self.client = BleakClient(address)
@@ -332,12 +467,7 @@ class BLEChatPeer:
             self.connected_address = address
 
             # Discover services and characteristics
-            services = await self.client.get_services()
-            chat_service = None
-            for service in services:
-                if service.uuid.lower() == CHAT_SERVICE_UUID.lower():
-                    chat_service = service
-                    break
+            chat_service = self.client.services.get_service(CHAT_SERVICE_UUID)
 
             if not chat_service:
                 print("[!] Chat service not found on peer device")
@@ -345,19 +475,31 @@ class BLEChatPeer:
                 return False
 
             # Find characteristics
-            for char in chat_service.characteristics:
-                if char.uuid.lower() == TX_CHAR_UUID.lower():
-                    self.tx_char = char
-                elif char.uuid.lower() == RX_CHAR_UUID.lower():
-                    self.rx_char = char
+            self.tx_char = chat_service.get_characteristic(TX_CHAR_UUID)
+            self.rx_char = chat_service.get_characteristic(RX_CHAR_UUID)
 
             if not self.tx_char or not self.rx_char:
                 print("[!] Required characteristics not found")
                 await self.disconnect()
                 return False
 
-            # Subscribe to notifications on RX characteristic
-            await self.client.start_notify(self.rx_char.uuid, self._notification_handler)
+            # Prefer raw sockets for the data path, falling back to D-Bus.
+            # AcquireWrite also reports the negotiated MTU
+            self._tx_sock, mtu = await self._acquire_char_socket(self.tx_char, "AcquireWrite")
+            self._rx_sock, _ = await self._acquire_char_socket(self.rx_char, "AcquireNotify")
+            if mtu is None:
+                mtu = await self._negotiate_mtu()
+            self._chunk = min(max(mtu - 3, DEFAULT_ATT_PAYLOAD), MAX_ATTR_VALUE_LEN)
+            print(f"[+] MTU: {mtu}, {self._chunk}-byte writes")
+            self._notify_acquired = self._rx_sock is not None
+            if self._rx_sock:
+                asyncio.get_running_loop().add_reader(self._rx_sock.fileno(), self._on_rx_readable)
+            else:
+                # Subscribe to notifications on RX characteristic
+                await self.client.start_notify(self.rx_char.uuid, self._notification_handler)
+            self._tx_task = asyncio.create_task(self.send_worker())
+            await self.request_2m_phy()
+            await self.set_connection_params(DEFAULT_CONN_PARAMS)
 
             print(f"[+] Connected to {address}")
             print(f"[+] Peer name: {self.client.address}")
@@ -365,17 +507,179 @@ class BLEChatPeer:
 
         except Exception as e:
             print(f"[-] Connection failed: {e}")
+            self._close_char_sockets()
             self.client = None
             self.connected_address = None
             return False
 
-    def _notification_handler(self, sender: BleakGATTCharacteristic, data: bytearray):
-        """Handle notifications from connected peer"""
+    async def _negotiate_mtu(self) -> int:
+        """Read the negotiated ATT MTU when the TX socket could not be acquired"""
+        # BlueZ only exposes the negotiated MTU once a characteristic has been
+        # acquired, which Bleak's BlueZ backend does in _acquire_mtu()
+        acquire_mtu = getattr(self.client._backend, "_acquire_mtu", None)
+        if acquire_mtu is not None:
+            try:
+                await acquire_mtu()
+            except Exception as e:
+                print(f"[!] MTU exchange failed, using default: {e}")
+        return self.client.mtu_size
+
+    def _open_hci_socket(self) -> socket.socket:
+        sock = socket.socket(socket.AF_BLUETOOTH, socket.SOCK_RAW, socket.BTPROTO_HCI)
+        sock.bind((HCI_DEV_ID,))
+        return sock
+
+    def _get_conn_handle(self, sock: socket.socket) -> int:
+        """Look up the HCI handle of the LE link to the connected peer"""
+        bdaddr = bytes.fromhex(self.connected_address.replace(":", ""))[::-1]
+        # struct hci_conn_info_req: bdaddr, type, padding, then hci_conn_info
+        req = bytearray(bdaddr + bytes([HCI_LE_LINK]) + bytes(17))
+        fcntl.ioctl(sock.fileno(), HCIGETCONNINFO, req, True)
+        return struct.unpack_from("<H", req, 8)[0]
+
+    def _send_hci_command(self, sock: socket.socket, opcode: int, params: bytes) -> int:
+        """Send an HCI command and return the status the controller answers with"""
+        # struct hci_filter: only Command Status and Command Complete events
+        sock.setsockopt(
+            SOL_HCI,
+            HCI_FILTER,
+            struct.pack(
+                "<IIIH",
+                1 << HCI_EVENT_PKT,
+                (1 << HCI_EV_CMD_STATUS) | (1 << HCI_EV_CMD_COMPLETE),
+                0,
+                0,
+            ),
+        )
+        sock.settimeout(HCI_CMD_TIMEOUT)
+        sock.send(struct.pack("<BHB", HCI_COMMAND_PKT, opcode, len(params)) + params)
+        while True:
+            event = sock.recv(260)
+            if len(event) < 7:
+                continue
+            # Command Status: type, code, length, status, num commands, opcode
+            if event[1] == HCI_EV_CMD_STATUS and struct.unpack_from("<H", event, 5)[0] == opcode:
+                return event[3]
+            # Command Complete: type, code, length, num commands, opcode, status
+            if event[1] == HCI_EV_CMD_COMPLETE and struct.unpack_from("<H", event, 4)[0] == opcode:
+                return event[6]
+
+    def _hci_request(self, opcode: int, build_params) -> int:
+        """Send a command for the current link over a fresh HCI socket (blocking)"""
+        with self._open_hci_socket() as sock:
+            handle = self._get_conn_handle(sock)
+            return self._send_hci_command(sock, opcode, build_params(handle))
+
+    async def set_connection_params(self, profile: str) -> bool:
+        """Request new connection parameters from the controller (needs CAP_NET_RAW)"""
+        if not self.client or not self.client.is_connected:
+            print("[-] Not connected to any peer")
+            return False
+        min_interval, max_interval, latency, timeout = CONN_PARAM_PROFILES[profile]
+        try:
+            # Keep the blocking HCI round trip off the event loop
+            status = await asyncio.to_thread(
+                self._hci_request,
+                HCI_OP_LE_CONN_UPDATE,
+                lambda handle: struct.pack(
+                    "<7H", handle, min_interval, max_interval, latency, timeout, 0, 0
+                ),
+            )
+        except (OSError, AttributeError) as e:
+            print(f"[!] Could not update connection parameters: {e}")
+            return False
+        if status:
+            print(f"[!] Controller rejected connection parameters (status 0x{status:02x})")
+            return False
+        print(
+            f"[+] Connection parameters: {profile} "
+            f"({min_interval * 1.25:g}-{max_interval * 1.25:g} ms, latency {latency})"
+        )
+        return True
+
+    async def request_2m_phy(self) -> bool:
+        """Ask the controller to move the link to LE 2M PHY (BLE 5.0+)"""
         try:
-            message = data.decode("utf-8")
-            asyncio.create_task(self.message_queue.put(("received", message)))
+            # all_phys=0: both TX and RX preferences are given
+            status = await asyncio.to_thread(
+                self._hci_request,
+                HCI_OP_LE_SET_PHY,
+                lambda handle: struct.pack("<HBBBH", handle, 0, LE_PHY_2M, LE_PHY_2M, 0),
+            )
+        except (OSError, AttributeError) as e:
+            print(f"[!] Could not request 2M PHY: {e}")
+            return False
+        if status:
+            print("[*] 2M PHY not supported, staying on 1M")
+            return False
+        print("[+] Requested 2M PHY")
+        return True
+
+    async def _acquire_char_socket(
+        self, char: BleakGATTCharacteristic, method: str
+    ) -> Tuple[Optional[socket.socket], Optional[int]]:
+        """Acquire a BlueZ SEQPACKET socket and its MTU for a remote characteristic (BlueZ 5.46+)"""
+        # Older Bleak exposes the D-Bus path directly; newer keeps it in obj
+        path = getattr(char, "path", None)
+        if path is None and isinstance(char.obj, tuple):
+            path = char.obj[0]
+        # Use the bus Bleak's BlueZ backend connected with fd passing, so the
+        # socket path doesn't depend on peripheral setup succeeding
+        bus = getattr(self.client._backend, "_bus", None)
+        if not path or not bus:
+            return None, None
+        try:
+            reply = await bus.call(
+                Message(
+                    destination=BLUEZ_SERVICE,
+                    path=path,
+                    interface=GATT_CHAR_IFACE,
+                    member=method,
+                    signature="a{sv}",
+                    body=[{}],
+                )
+            )
+            if reply.message_type == MessageType.ERROR:
+                raise DBusError(reply.error_name, reply.body[0] if reply.body else "")
+            # The "h" return value is an index into the message's unix_fds
+            sock = socket.socket(fileno=reply.unix_fds[reply.body[0]])
+            sock.setblocking(False)
+            return sock, reply.body[1]
         except Exception as e:
-            print(f"[Error decoding notification: {e}]")
+            print(f"[!] {method} unavailable, using D-Bus: {e}")
+            return None, None
+
+    def _on_rx_readable(self):
+        """Read one notification PDU from the acquired RX socket"""
+        try:
+            data = self._rx_sock.recv(MAX_ATT_MTU)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            print(f"[!] Notification socket error: {e}")
+            data = b""
+        if not data:
+            self._close_char_sockets()
+            return
+        self._notification_handler(self.rx_char, bytearray(data))
+
+    def _close_char_sockets(self):
+        """Close any acquired characteristic sockets"""
+        if self._rx_sock:
+            try:
+                asyncio.get_running_loop().remove_reader(self._rx_sock.fileno())
+            except RuntimeError:
+                pass
+            self._rx_sock.close()
+            self._rx_sock = None
+        if self._tx_sock:
+            self._tx_sock.close()
+            self._tx_sock = None
+
+    def _notification_handler(self, sender: BleakGATTCharacteristic, data: bytearray):
+        """Handle notifications from connected peer"""
+        for message in self._notify_reassembler.feed(data):
+            self.message_queue.put_nowait(("received", message))
 
     async def send_message(self, message: str) -> bool:
         """Send a message to the connected peer"""
@@ -387,21 +691,100 @@ class BLEChatPeer:
             print("[-] TX characteristic not available")
             return False
 
+        encoded = message.encode("utf-8")
+        self._pending_tx += FRAME_HEADER.pack(len(self._user_prefix) + len(encoded))
+        self._pending_tx += self._user_prefix
+        self._pending_tx += encoded
+        # Coalesce messages sent in quick succession (e.g. a paste) into
+        # shared writes; framing keeps them separable on the other side
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                TX_COALESCE_DELAY, self._flush_tx
+            )
+        print(f"[You]: {message}")
+        return True
+
+    def _flush_tx(self):
+        """Split the pending framed stream into chunks for the send worker"""
+        self._flush_handle = None
+        payload, self._pending_tx = self._pending_tx, bytearray()
+        view = memoryview(payload)
+        # The length prefix is sent once per message, not per fragment, so
+        # every write carries a full chunk of the framed stream
+        for i in range(0, len(payload), self._chunk):
+            self._tx_queue.put_nowait(view[i:i + self._chunk])
+
+    async def send_worker(self):
+        """Drain queued chunks to the peer, keeping up to TX_QUEUE_DEPTH writes in flight"""
+        # Bind the queue now; _stop_send_worker swaps in a new one
+        queue = self._tx_queue
+        while True:
+            chunk = await queue.get()
+            if self._tx_sock:
+                # asyncio allows one pending writer per fd and the kernel
+                # socket buffer already pipelines PDUs, so send one at a time
+                await self._write_chunk(chunk)
+                queue.task_done()
+                continue
+            await self._tx_sem.acquire()
+            # Writes are issued in queue order; only their completion overlaps
+            task = asyncio.create_task(self._write_chunk(chunk))
+            task.add_done_callback(functools.partial(self._on_write_done, queue))
+
+    def _on_write_done(self, queue: asyncio.Queue, _task: asyncio.Task):
+        self._tx_sem.release()
+        queue.task_done()
+
+    async def _drain_tx(self):
+        """Wait for queued and in-flight chunks to reach the peer"""
+        if not self._tx_task or not self.client or not self.client.is_connected:
+            return
+        # Send anything still waiting in the coalescing window now
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_tx()
         try:
-            formatted_message = f"{self.username}: {message}"
-            await self.client.write_gatt_char(self.tx_char.uuid, formatted_message.encode("utf-8"))
-            print(f"[You]: {message}")
-            return True
+            await asyncio.wait_for(self._tx_queue.join(), TX_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            print("[!] Timed out sending queued messages")
+
+    async def _write_chunk(self, chunk: memoryview):
+        """Write a single chunk to the TX characteristic"""
+        try:
+            if self._tx_sock:
+                await asyncio.get_running_loop().sock_sendall(self._tx_sock, chunk)
+            else:
+                await self.client.write_gatt_char(self.tx_char, chunk, response=False)
         except Exception as e:
             print(f"[-] Failed to send message: {e}")
-            return False
+
+    def _stop_send_worker(self):
+        """Cancel the send worker and drop any chunks still queued"""
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._pending_tx = bytearray()
+        if self._tx_task:
+            self._tx_task.cancel()
+            self._tx_task = None
+        # A fresh queue resets the unfinished-task count that join() waits on
+        self._tx_queue = asyncio.Queue()
 
     async def disconnect(self):
         """Disconnect from current peer"""
+        await self._drain_tx()
+        self._stop_send_worker()
+        # Reset even if the peer already dropped the link mid-frame
+        self._notify_reassembler.reset()
+        notify_acquired, self._notify_acquired = self._notify_acquired, False
+        self._close_char_sockets()
         if self.client and self.client.is_connected:
             try:
-                if self.rx_char:
-                    await self.client.stop_notify(self.rx_char.uuid)
+                if self.rx_char and not notify_acquired:
+                    try:
+                        await self.client.stop_notify(self.rx_char.uuid)
+                    except Exception as e:
+                        print(f"[!] Error stopping notifications: {e}")
                 await self.client.disconnect()
                 print("[*] Disconnected")
             except Exception as e:
@@ -411,17 +794,18 @@ class BLEChatPeer:
                 self.connected_address = None
                 self.tx_char = None
                 self.rx_char = None
+                self._chunk = DEFAULT_ATT_PAYLOAD
 
     async def process_messages(self):
         """Process received messages from queue"""
         while self.running:
             try:
-                msg_type, message = await asyncio.wait_for(self.message_queue.get(), timeout=0.5)
+                msg_type, message = await self.message_queue.get()
+                if (msg_type, message) == QUIT_MESSAGE:
+                    break
                 if msg_type == "received":
                     print(f"\n[Peer]: {message}")
                     print("> ", end="", flush=True)
-            except asyncio.TimeoutError:
-                continue
             except Exception as e:
                 print(f"[Error processing message: {e}]")
 
@@ -431,21 +815,29 @@ class BLEChatPeer:
         print(f"[*] Username: {self.username}")
         print(f"[*] Type /help for commands\n")
 
-        # Start peripheral mode in background thread
-        peripheral_thread = None
-        if self.bus:
-            import threading
-            peripheral_thread = threading.Thread(target=self._run_peripheral_loop, daemon=True)
-            peripheral_thread.start()
-
         # Start message processing
         message_task = asyncio.create_task(self.process_messages())
 
-        # Main command loop
+        await self._open_stdin()
+        try:
+            await self._command_loop()
+        finally:
+            # Cleanup
+            if self._stdin_reader:
+                # A pipe transport leaves its file description non-blocking
+                os.set_blocking(STDIN_FD, True)
+            message_task.cancel()
+        await self.disconnect()
+
+    async def _command_loop(self):
+        """Read and dispatch user input until stopped"""
         while self.running:
             try:
-                user_input = await asyncio.to_thread(input, "> ")
-                user_input = user_input.strip()
+                print("> ", end="", flush=True)
+                line = await self._read_line()
+                if not line:
+                    raise EOFError
+                user_input = line.decode().strip()
 
                 if not user_input:
                     continue
@@ -457,23 +849,46 @@ class BLEChatPeer:
 
             except (KeyboardInterrupt, EOFError):
                 print("\n[*] Exiting...")
-                self.running = False
+                self.stop()
                 break
             except Exception as e:
                 print(f"[Error: {e}]")
 
-        # Cleanup
-        await self.disconnect()
-        message_task.cancel()
-        # Peripheral thread will exit when daemon=True
-
-    def _run_peripheral_loop(self):
-        """Run the GLib main loop for D-Bus peripheral mode"""
+    async def _open_stdin(self):
+        """Read stdin on the event loop when it is a pipe, socket or terminal"""
         try:
-            loop = GLib.MainLoop()
-            loop.run()
-        except Exception as e:
-            print(f"[Peripheral loop error: {e}]")
+            mode = os.fstat(STDIN_FD).st_mode
+            if sys.stdin.isatty():
+                # Open the terminal afresh: a dup would share fd 0's file
+                # description with stdout, and the transport makes it
+                # non-blocking
+                pipe = open(os.ttyname(STDIN_FD), "rb", buffering=0)
+            elif stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode):
+                # A duplicate lets the transport close at EOF without
+                # closing fd 0
+                pipe = os.fdopen(os.dup(STDIN_FD), "rb", buffering=0)
+            else:
+                return
+            reader = asyncio.StreamReader()
+            protocol = asyncio.StreamReaderProtocol(reader)
+            await asyncio.get_running_loop().connect_read_pipe(lambda: protocol, pipe)
+            self._stdin_reader = reader
+        except (OSError, ValueError):
+            self._stdin_reader = None
+
+    async def _read_line(self) -> bytes:
+        """Read one line of user input, or b"" at end of input"""
+        if self._stdin_reader:
+            return await self._stdin_reader.readline()
+        # Regular files can't use a pipe transport; read them in a thread
+        return await asyncio.to_thread(sys.stdin.buffer.readline)
+
+    def stop(self):
+        """Stop the chat loops and wake the message processor"""
+        self.running = False
+        self.message_queue.put_nowait(QUIT_MESSAGE)
+        if self._stdin_reader:
+            self._stdin_reader.feed_eof()
 
     async def _handle_command(self, command: str):
         """Handle user commands"""
@@ -485,6 +900,7 @@ class BLEChatPeer:
             print("  /scan              - Scan for nearby BLE chat peers")
             print("  /connect <addr>    - Connect to a peer by address")
             print("  /status            - Show connection status")
+            print("  /params <profile>  - Set connection parameters (fast|balanced|power)")
             print("  /disconnect        - Disconnect from current peer")
             print("  /quit              - Exit the application")
             print("  /help              - Show this help message")
@@ -512,11 +928,17 @@ class BLEChatPeer:
             else:
                 print("[-] Not connected")
 
+        elif cmd == "/params":
+            if len(parts) < 2 or parts[1] not in CONN_PARAM_PROFILES:
+                print(f"[-] Usage: /params <{'|'.join(CONN_PARAM_PROFILES)}>")
+                return
+            await self.set_connection_params(parts[1])
+
         elif cmd == "/disconnect":
             await self.disconnect()
 
         elif cmd == "/quit":
-            self.running = False
+            self.stop()
 
         else:
             print(f"[-] Unknown command: {cmd}. Type /help for available commands.")
@@ -531,25 +953,20 @@ async def main():
 
     peer = BLEChatPeer(username)
 
-    # Set up signal handlers for graceful shutdown
-    def signal_handler(sig, frame):
-        peer.running = False
-
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-
-    # Set up peripheral mode (run in thread to avoid blocking)
-    import threading
-    def setup_peripheral_thread():
-        try:
-            peer.setup_peripheral()
-        except Exception as e:
-            print(f"[Warning] Peripheral setup failed: {e}")
-    
-    peripheral_setup_thread = threading.Thread(target=setup_peripheral_thread, daemon=True)
-    peripheral_setup_thread.start()
-    # Give it a moment to initialize
-    await asyncio.sleep(0.5)
+    # Set up signal handlers for graceful shutdown; registering them on the
+    # loop wakes the selector so stop() takes effect while idle
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, peer.stop)
+
+    # Set up peripheral mode; D-Bus is serviced on this event loop.
+    # setup_peripheral returns once BlueZ has answered RegisterApplication,
+    # so wait for that rather than a fixed delay, but don't hold up the
+    # prompt if BlueZ is slow
+    setup_task = asyncio.create_task(peer.setup_peripheral())
+    await asyncio.wait({setup_task}, timeout=PERIPHERAL_SETUP_TIMEOUT)
+    if not setup_task.done():
+        print("[*] Peripheral setup still in progress...")
 
     # Run interactive mode
     await peer.interactive_mode()